@@ -7,25 +7,27 @@ import sys
 import json
 import time
 import argparse
+import asyncio
+import inspect
 import subprocess
 import webbrowser
 import traceback
+import functools
+import fnmatch
 from pathlib import Path
-import openai
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
 import shutil
 import re
 import threading
+import aiofiles
+import orjson
 import importlib
+from cachetools import TTLCache
 
 # Import local modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-try:
-    from tools.docker_utils import list_all_services, open_web_service, open_webui_ui, open_flowise
-except ImportError:
-    print("Warning: Docker utilities not found. Some features may be limited.")
+from tools.shell_utils import ShellPool
+from tools.rate_limiter import RateLimiter
 
 # Load environment variables
 load_dotenv()
@@ -33,29 +35,212 @@ load_dotenv()
 # Set system prompt path
 SYSTEM_PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'system_prompt.txt')
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
-    print("Error: OPENAI_API_KEY not found in environment variables.")
-    sys.exit(1)
+# Batch multi-prompt completions into one request (completions endpoint). Off by default
+# so interactive use keeps gpt-4 and stays well inside per-request rate limits.
+BATCH_COMPLETIONS = os.getenv("CODEX_BATCH_COMPLETIONS", "").lower() in ("1", "true", "yes")
+BATCH_COMPLETIONS_MODEL = os.getenv("CODEX_BATCH_MODEL", "gpt-3.5-turbo-instruct")
+BATCH_MAX_TOKENS = int(os.getenv("CODEX_BATCH_MAX_TOKENS", "2048"))
+
+# Coalesce REPL turns that arrive within BATCH_WAIT_MS of each other, up to MAX_BATCH per call
+MAX_BATCH = int(os.getenv("CODEX_MAX_BATCH", "8"))
+BATCH_WAIT_MS = int(os.getenv("CODEX_BATCH_WAIT_MS", "100"))
+
+# Client-side pacing for OpenAI calls, so bursts wait for capacity instead of hitting 429s.
+# Requests reserve ~4 characters per prompt token plus the expected reply size.
+REQUESTS_PER_MINUTE = float(os.getenv("CODEX_RPM", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("CODEX_TPM", "30000"))
+RESPONSE_TOKEN_ESTIMATE = 1000
+
+# How often to check on a submitted Batch API job
+BATCH_POLL_SECONDS = int(os.getenv("CODEX_BATCH_POLL_SECONDS", "30"))
+
+# Longest string field (stdout, file contents, ...) shown when printing a tool result
+MAX_RESULT_CHARS = 10000
+
+# Print full stack traces for request errors (formatting them walks the stack and reads source)
+DEBUG = bool(os.getenv("CODEX_DEBUG"))
+
+# Fenced blocks in model output: any code block, and JSON tool calls
+CODE_FENCE = re.compile(r"```(?:\w+)?\n([\s\S]*?)\n```")
+JSON_FENCE = re.compile(r"```json\s*([\s\S]*?)\s*```")
+
+# Recently fetched pages, keyed by URL (web_browse runs on worker threads, hence the lock)
+FETCH_CACHE = TTLCache(maxsize=128, ttl=300)
+FETCH_CACHE_LOCK = threading.Lock()
+
+# Pages are cut to this many bytes before decoding and parsing; plenty for a 5000-character summary
+MAX_FETCH_BYTES = 256 * 1024
+
+# Heavy dependencies (openai, requests, selectolax, the Docker helpers) are imported on
+# first use so startup and tools that don't need them stay fast
+
+def _configure_openai():
+    """Import and configure the OpenAI SDK"""
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
+
+@functools.lru_cache(maxsize=1)
+def _http_session():
+    """Shared HTTP session so repeated fetches reuse keep-alive connections"""
+    import requests
+    session = requests.Session()
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
+    })
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20))
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20))
+    return session
+
+@functools.lru_cache(maxsize=1)
+def _hf_api():
+    """Shared Hugging Face Hub API client"""
+    from huggingface_hub import HfApi
+    return HfApi()
+
+@functools.lru_cache(maxsize=32)
+def _inference_client(model_id):
+    """Inference client per model, reused so its HTTP setup and token lookup happen once"""
+    from huggingface_hub import InferenceClient
+    return InferenceClient(model=model_id)
+
+def _docker_utils():
+    """Import the Docker helpers (they pull in requests)"""
+    from tools import docker_utils
+    return docker_utils
+
+def _invalidate_docker_caches():
+    """Drop the Docker helpers' cached container listing and port mappings after containers change"""
+    try:
+        _docker_utils().invalidate_container_cache()
+    except ImportError:
+        # The helpers never loaded, so there is nothing cached
+        pass
+
+@functools.lru_cache(maxsize=1)
+def _read_system_prompt(path, mtime):
+    """Read the system prompt; keyed on mtime so edits to the file are picked up"""
+    return Path(path).read_text()
+
+@functools.lru_cache(maxsize=256)
+def _search_url(query):
+    """Render the search URL for a query"""
+    return f"https://www.google.com/search?q={query.replace(' ', '+')}"
+
+def _code_generation_prompt(language):
+    """System prompt for code generation in the given language"""
+    return f"You are an expert {language} programmer. Write complete, working code based on the following description. Include detailed comments."
+
+def _estimate_tokens(texts, max_tokens):
+    """Rough token count for a request: prompt characters / 4 plus the reply budget"""
+    return sum(len(text) for text in texts) // 4 + max_tokens
+
+def _is_read_only(tool_data):
+    """Whether a tool call only reads state, so it may run alongside neighbouring reads"""
+    params = tool_data.get("params") or {}
+    if tool_data.get("parallel") is True:
+        # The model declared this call independent of the ones around it
+        return True
+    if tool_data["tool"] == "search_docs":
+        return True
+    if tool_data["tool"] == "file_operations":
+        return params.get("operation") in ("read", "list")
+    if tool_data["tool"] == "web_browse":
+        return params.get("action", "open") == "fetch"
+    return False
+
+def _truncate_strings(value, limit):
+    """Cap every string in a (nested) tool result at limit characters"""
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + f"... [{len(value) - limit} more characters]"
+    if isinstance(value, dict):
+        return {key: _truncate_strings(item, limit) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_truncate_strings(item, limit) for item in value]
+    return value
+
+def _format_result(result):
+    """Render a tool result for the terminal, capping large fields like stdout first"""
+    return orjson.dumps(
+        _truncate_strings(result, MAX_RESULT_CHARS),
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+        default=str
+    ).decode()
+
+def _fast_copy(src, dst):
+    """Copy a file like shutil.copy2, moving the data in the kernel with copy_file_range where available"""
+    if not hasattr(os, "copy_file_range"):
+        # shutil already takes the zero-copy route here (fcopyfile on macOS, sendfile elsewhere)
+        return shutil.copy2(src, dst)
+    
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    
+    # Opening dst truncates it, which would wipe src if they are the same file
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            # Copy until EOF rather than st_size bytes: /proc, /sys and some FUSE files report size 0
+            copied_total = 0
+            while True:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30)
+                if copied == 0:
+                    break
+                copied_total += copied
+            if copied_total == 0:
+                # Empty, or a pseudo-file some kernels won't copy in-kernel; read it the ordinary way
+                shutil.copyfileobj(fsrc, fdst, length=1 << 20)
+        except OSError:
+            # e.g. cross-device copies on older kernels: start over with a buffered copy
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst, length=1 << 20)
+    
+    shutil.copystat(src, dst)
+    return dst
+
+async def _run(*cmd, cwd=None):
+    """Run a command without blocking the event loop, raising CalledProcessError on failure"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    stdout, stderr = stdout.decode(errors="replace"), stderr.decode(errors="replace")
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
 
 class Codex:
+    # Tool name -> method implementing it
+    TOOL_METHODS = {
+        "file_operations": "afile_operations",
+        "shell_command": "shell_command",
+        "search_docs": "search_docs",
+        "code_completion": "code_completion",
+        "web_browse": "web_browse",
+        "code_generation": "code_generation",
+        "code_generation_batch": "code_generation_batch",
+        "vscode": "vscode",
+        "github": "github_operations",
+        "huggingface": "huggingface_operations",
+        "docker": "docker_operations",
+        "install_package": "install_package",
+        "open_service": "open_service",
+        "list_services": "list_services",
+    }
+    _TOOL_NAMES = frozenset(TOOL_METHODS)
+    
     def __init__(self):
-        self.tools = {
-            "file_operations": self.file_operations,
-            "shell_command": self.shell_command,
-            "search_docs": self.search_docs,
-            "code_completion": self.code_completion,
-            "web_browse": self.web_browse,
-            "code_generation": self.code_generation,
-            "vscode": self.vscode,
-            "github": self.github_operations,
-            "huggingface": self.huggingface_operations,
-            "docker": self.docker_operations,
-            "install_package": self.install_package,
-            "open_service": self.open_service,
-            "list_services": self.list_services,
-        }
+        self.tools = {name: getattr(self, method) for name, method in self.TOOL_METHODS.items()}
+        
+        # Output of the request being processed, written out once it completes
+        self._output = []
+        
+        # Persistent shells reused across shell_command calls
+        self.shells = ShellPool()
         
         # Initialize workspace
         self.workspace_path = os.path.dirname(os.path.abspath(__file__))
@@ -64,6 +249,18 @@ class Codex:
         
         # Load system prompt if available
         self.system_prompt = self.load_system_prompt()
+        
+        # Async OpenAI client, created on first use, and the limiter shared by all its calls
+        self._aclient = None
+        self.limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+    
+    @property
+    def aclient(self):
+        """Async client so API round-trips don't block the event loop"""
+        if self._aclient is None:
+            openai = _configure_openai()
+            self._aclient = openai.AsyncOpenAI(api_key=openai.api_key)
+        return self._aclient
     
     def welcome_message(self):
         """Display welcome message"""
@@ -71,7 +268,7 @@ class Codex:
         print("✨ Welcome to Codex - Your AI-powered Development Environment ✨")
         print("="*60)
         print("🔧 Available tools:")
-        for tool in self.tools:
+        for tool in self.TOOL_METHODS:
             print(f"  • {tool}")
         print("\n💡 Type 'help' for assistance or 'exit' to quit")
         print("="*60 + "\n")
@@ -80,8 +277,7 @@ class Codex:
         """Load system prompt from file"""
         try:
             if os.path.exists(SYSTEM_PROMPT_PATH):
-                with open(SYSTEM_PROMPT_PATH, 'r') as f:
-                    return f.read()
+                return _read_system_prompt(SYSTEM_PROMPT_PATH, os.path.getmtime(SYSTEM_PROMPT_PATH))
             else:
                 print(f"System prompt not found at {SYSTEM_PROMPT_PATH}")
                 return "You are Codex, an AI assistant with the ability to help with coding and technical tasks. You have access to various tools to assist the user."
@@ -97,13 +293,14 @@ class Codex:
     def shell_command(self, command):
         """Execute a shell command and return the output"""
         try:
-            result = subprocess.run(command, shell=True, check=True, 
-                                  text=True, capture_output=True)
-            return {"status": "success", "stdout": result.stdout, "stderr": result.stderr}
-        except subprocess.CalledProcessError as e:
-            return {"status": "error", "stdout": e.stdout, "stderr": e.stderr, "code": e.returncode}
+            code, stdout, stderr = self.shells.run(command)
+            if code != 0:
+                return {"status": "error", "stdout": stdout, "stderr": stderr, "code": code}
+            return {"status": "success", "stdout": stdout, "stderr": stderr}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
     
-    def file_operations(self, operation, path, content=None):
+    def file_operations(self, operation, path, content=None, limit=1000, pattern=None):
         """Perform file operations like read, write, list"""
         path_obj = Path(path)
         
@@ -124,14 +321,31 @@ class Codex:
         
         elif operation == "list":
             try:
-                files = [str(p) for p in Path(path).iterdir()]
-                return {"status": "success", "files": files}
+                # Stream entries and stop at the limit rather than materializing huge directories
+                files = []
+                truncated = False
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if pattern and not fnmatch.fnmatch(entry.name, pattern):
+                            continue
+                        if len(files) >= limit:
+                            truncated = True
+                            break
+                        files.append(entry.path)
+                return {"status": "success", "files": files, "truncated": truncated}
             except Exception as e:
                 return {"status": "error", "message": str(e)}
                 
         elif operation == "copy":
             try:
-                shutil.copy2(path, content)  # content is the destination path
+                _fast_copy(path, content)  # content is the destination path
+                return {"status": "success"}
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+                
+        elif operation == "copytree":
+            try:
+                shutil.copytree(path, content, copy_function=_fast_copy)  # content is the destination path
                 return {"status": "success"}
             except Exception as e:
                 return {"status": "error", "message": str(e)}
@@ -148,59 +362,204 @@ class Codex:
         
         return {"status": "error", "message": "Unknown operation"}
     
+    async def afile_operations(self, operation, path, content=None, limit=1000, pattern=None):
+        """Async file operations: reads and writes yield to the event loop, the rest run on a worker thread"""
+        if operation == "read":
+            try:
+                async with aiofiles.open(path, "r") as f:
+                    return {"status": "success", "content": await f.read()}
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+        
+        elif operation == "write":
+            try:
+                # Create parent directories if they don't exist
+                await asyncio.to_thread(Path(path).parent.mkdir, parents=True, exist_ok=True)
+                async with aiofiles.open(path, "w") as f:
+                    await f.write(content)
+                return {"status": "success"}
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+        
+        return await asyncio.to_thread(self.file_operations, operation, path, content, limit, pattern)
+    
     def search_docs(self, query):
         """Search documentation"""
         try:
             # Implementation could be enhanced with local doc search or web search
-            search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
+            search_url = _search_url(query)
             # Open a browser with the search results
             webbrowser.open(search_url)
             return {"status": "success", "message": f"Opened search results for: {query}"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def code_completion(self, code, language="python"):
+    async def complete_batch(self, system_prompt, prompts):
+        """Complete several prompts that share a system prompt, returning one result per prompt"""
+        if BATCH_COMPLETIONS and len(prompts) > 1:
+            # One request for every prompt: the completions endpoint accepts a list of prompts
+            batch = [f"{system_prompt}\n\n{prompt}" for prompt in prompts]
+            async with self.limiter.reserve(_estimate_tokens(batch, BATCH_MAX_TOKENS * len(batch))):
+                response = await self.aclient.completions.create(
+                    model=BATCH_COMPLETIONS_MODEL,
+                    prompt=batch,
+                    max_tokens=BATCH_MAX_TOKENS
+                )
+            texts = [None] * len(prompts)
+            for choice in response.choices:
+                texts[choice.index] = choice.text
+            return texts
+        
+        # Chat models take one conversation per request, so fan out with the system message built once
+        system_message = {"role": "system", "content": system_prompt}
+        
+        async def chat(prompt):
+            async with self.limiter.reserve(_estimate_tokens([system_prompt, prompt], RESPONSE_TOKEN_ESTIMATE)):
+                return await self.aclient.chat.completions.create(
+                    model="gpt-4",
+                    messages=[system_message, {"role": "user", "content": prompt}]
+                )
+        
+        responses = await asyncio.gather(*[chat(prompt) for prompt in prompts], return_exceptions=True)
+        return [r if isinstance(r, Exception) else r.choices[0].message.content for r in responses]
+    
+    async def code_completion(self, code, language="python"):
         """Get code completion using OpenAI API"""
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4", 
-                messages=[
-                    {"role": "system", "content": f"You are an expert {language} programmer. Complete the following code."},
-                    {"role": "user", "content": code}
-                ]
+            [completion] = await self.complete_batch(
+                f"You are an expert {language} programmer. Complete the following code.", [code]
             )
-            return {"status": "success", "completion": response.choices[0].message.content}
+            if isinstance(completion, Exception):
+                raise completion
+            return {"status": "success", "completion": completion}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def code_generation(self, description, language="python", file_path=None):
+    async def code_generation(self, description, language="python", file_path=None):
         """Generate code from description"""
+        results = await self.code_generation_batch([description], language, [file_path])
+        return results[0]
+    
+    async def code_generation_batch(self, descriptions, language="python", file_paths=None):
+        """Generate code for several descriptions: concurrent gpt-4 requests, or one completions request with CODEX_BATCH_COMPLETIONS"""
+        file_paths = file_paths or [None] * len(descriptions)
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4", 
-                messages=[
-                    {"role": "system", "content": f"You are an expert {language} programmer. Write complete, working code based on the following description. Include detailed comments."},
-                    {"role": "user", "content": description}
-                ]
-            )
-            
-            code = response.choices[0].message.content
-            
-            # Extract code if wrapped in markdown code blocks
-            if "```" in code:
-                pattern = r"```(?:\w+)?\n([\s\S]*?)\n```"
-                matches = re.findall(pattern, code)
-                if matches:
-                    code = "\n".join(matches)
-            
-            # Save to file if path is provided
-            if file_path:
-                Path(file_path).write_text(code)
-                return {"status": "success", "code": code, "message": f"Code saved to {file_path}"}
-            else:
-                return {"status": "success", "code": code}
+            codes = await self.complete_batch(_code_generation_prompt(language), descriptions)
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            return [{"status": "error", "message": str(e)} for _ in descriptions]
+        
+        results = []
+        for code, file_path in zip(codes, file_paths):
+            try:
+                if isinstance(code, Exception):
+                    raise code
+                
+                results.append(await self.save_generated_code(code, file_path))
+            except Exception as e:
+                results.append({"status": "error", "message": str(e)})
+        return results
+    
+    async def save_generated_code(self, code, file_path=None):
+        """Strip markdown fences from generated code and save it if a path is given"""
+        # Extract code if wrapped in markdown code blocks
+        if "```" in code:
+            matches = CODE_FENCE.findall(code)
+            if matches:
+                code = "\n".join(matches)
+        
+        # Save to file if path is provided
+        if file_path:
+            async with aiofiles.open(file_path, "w") as f:
+                await f.write(code)
+            return {"status": "success", "code": code, "message": f"Code saved to {file_path}"}
+        return {"status": "success", "code": code}
+    
+    async def code_generation_async_batch(self, descriptions, out_paths, language="python"):
+        """Generate code through the OpenAI Batch API (completes within 24h, at half the cost)"""
+        # The Batch API takes a JSONL file with one chat request per line
+        lines = [
+            json.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "gpt-4",
+                    "messages": [
+                        {"role": "system", "content": _code_generation_prompt(language)},
+                        {"role": "user", "content": description}
+                    ]
+                }
+            })
+            for index, description in enumerate(descriptions)
+        ]
+        batch_file = await self.aclient.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+        )
+        batch = await self.aclient.batches.create(
+            input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        print(f"Submitted batch {batch.id} with {len(descriptions)} tasks")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            batch = await self.aclient.batches.retrieve(batch.id)
+            print(f"Batch {batch.id}: {batch.status}")
+        
+        results = [{"status": "error", "message": f"Batch {batch.status} without a result"} for _ in descriptions]
+        if batch.output_file_id:
+            output = await self.aclient.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                index = int(record["custom_id"])
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    results[index] = {"status": "error", "message": str(record.get("error") or response.get("body"))}
+                    continue
+                code = response["body"]["choices"][0]["message"]["content"]
+                try:
+                    results[index] = await self.save_generated_code(code, out_paths[index])
+                except Exception as e:
+                    results[index] = {"status": "error", "message": str(e)}
+        return results
+    
+    async def run_batch_file(self, infile, language="python"):
+        """Submit the code generation tasks in a JSONL file ({"description", "file_path"} per line) as one batch"""
+        async with aiofiles.open(infile, "r") as f:
+            lines = (await f.read()).splitlines()
+        
+        # Check every task before uploading: results are only written to file_path, so a task
+        # without one would be paid for and then thrown away
+        tasks = []
+        errors = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                task = json.loads(line)
+            except json.JSONDecodeError as e:
+                errors.append(f"line {number}: invalid JSON ({e})")
+                continue
+            if not isinstance(task, dict) or not task.get("description") or not task.get("file_path"):
+                errors.append(f"line {number}: each task needs a \"description\" and a \"file_path\"")
+                continue
+            tasks.append(task)
+        
+        if errors:
+            for error in errors:
+                print(f"❌ {infile} {error}")
+            return False
+        
+        results = await self.code_generation_async_batch(
+            [task["description"] for task in tasks],
+            [task["file_path"] for task in tasks],
+            language
+        )
+        for task, result in zip(tasks, results):
+            print(f"{'✅' if result['status'] == 'success' else '❌'} {task['file_path']}: "
+                  f"{result.get('message', 'done')}")
+        return True
     
     def web_browse(self, url, action="open"):
         """Browse the web - open URLs, fetch page content"""
@@ -209,21 +568,38 @@ class Codex:
                 webbrowser.open(url)
                 return {"status": "success", "message": f"Opened {url} in browser"}
             elif action == "fetch":
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
-                }
-                response = requests.get(url, headers=headers)
-                soup = BeautifulSoup(response.text, "html.parser")
+                with FETCH_CACHE_LOCK:
+                    cached = FETCH_CACHE.get(url)
+                if cached is not None:
+                    return {"status": "success", **cached}
+                
+                from selectolax.lexbor import LexborHTMLParser
+                
+                # Read at most MAX_FETCH_BYTES off the wire; the rest of the page is never downloaded or parsed
+                with _http_session().get(url, stream=True, timeout=10) as response:
+                    # Error pages are reported, not cached, so a transient failure isn't replayed for the cache TTL
+                    response.raise_for_status()
+                    body = response.raw.read(MAX_FETCH_BYTES, decode_content=True)
+                    # requests assumes ISO-8859-1 for text/* without a charset; UTF-8 is the better guess for HTML
+                    declared = "charset" in response.headers.get("Content-Type", "").lower()
+                    html = body.decode(response.encoding if declared else "utf-8", errors="replace")
+                
+                tree = LexborHTMLParser(html)
+                tree.strip_tags(["script", "style"])
                 
                 # Extract text content
-                text = soup.get_text(separator="\n", strip=True)
+                text = tree.body.text(separator="\n", strip=True) if tree.body else ""
                 
                 # Limit response size to avoid overwhelming the AI
                 max_length = 5000
                 if len(text) > max_length:
                     text = text[:max_length] + "... [content truncated]"
                 
-                return {"status": "success", "content": text, "title": soup.title.string if soup.title else ""}
+                title = tree.css_first("title")
+                page = {"content": text, "title": title.text(strip=True) if title else ""}
+                with FETCH_CACHE_LOCK:
+                    FETCH_CACHE[url] = page
+                return {"status": "success", **page}
             else:
                 return {"status": "error", "message": "Unknown action"}
         except Exception as e:
@@ -254,13 +630,14 @@ class Codex:
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def github_operations(self, action, repo_path=None, remote_url=None, branch=None, commit_message=None):
+    async def github_operations(self, action, repo_path=None, remote_url=None, branch=None, commit_message=None):
         """Perform GitHub operations"""
         try:
+            cwd = repo_path or self.workspace_path
+            
             if action == "init":
                 # Initialize a new git repository
-                result = subprocess.run(["git", "init"], cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                result = await _run("git", "init", cwd=cwd)
                 return {"status": "success", "message": f"Initialized git repository: {result.stdout}"}
                 
             elif action == "clone":
@@ -268,14 +645,12 @@ class Codex:
                 if not remote_url:
                     return {"status": "error", "message": "Remote URL is required for clone action"}
                 
-                result = subprocess.run(["git", "clone", remote_url, repo_path or "."], 
-                                      capture_output=True, text=True, check=True)
+                result = await _run("git", "clone", remote_url, repo_path or ".")
                 return {"status": "success", "message": f"Cloned repository: {result.stdout}"}
                 
             elif action == "add":
                 # Add files to git
-                result = subprocess.run(["git", "add", "."], cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                await _run("git", "add", ".", cwd=cwd)
                 return {"status": "success", "message": "Added files to git staging"}
                 
             elif action == "commit":
@@ -283,9 +658,7 @@ class Codex:
                 if not commit_message:
                     return {"status": "error", "message": "Commit message is required"}
                 
-                result = subprocess.run(["git", "commit", "-m", commit_message], 
-                                      cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                result = await _run("git", "commit", "-m", commit_message, cwd=cwd)
                 return {"status": "success", "message": f"Committed changes: {result.stdout}"}
                 
             elif action == "push":
@@ -296,10 +669,34 @@ class Codex:
                 if branch:
                     cmd.append(branch)
                 
-                result = subprocess.run(cmd, cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                result = await _run(*cmd, cwd=cwd)
                 return {"status": "success", "message": f"Pushed changes: {result.stdout}"}
                 
+            elif action == "commit_and_push":
+                # Stage, then commit while the fetch runs over the network, then push
+                if not commit_message:
+                    return {"status": "error", "message": "Commit message is required"}
+                
+                await _run("git", "add", ".", cwd=cwd)
+                fetch_cmd = ["git", "fetch"] + ([remote_url] if remote_url else [])
+                commit, fetch = await asyncio.gather(
+                    _run("git", "commit", "-m", commit_message, cwd=cwd),
+                    _run(*fetch_cmd, cwd=cwd),
+                    return_exceptions=True
+                )
+                for outcome in (commit, fetch):
+                    if isinstance(outcome, Exception):
+                        raise outcome
+                
+                push_cmd = ["git", "push"]
+                if remote_url:
+                    push_cmd.append(remote_url)
+                if branch:
+                    push_cmd.append(branch)
+                
+                push = await _run(*push_cmd, cwd=cwd)
+                return {"status": "success", "message": f"Committed and pushed changes: {commit.stdout}{push.stdout}"}
+                
             elif action == "pull":
                 # Pull changes
                 cmd = ["git", "pull"]
@@ -308,14 +705,12 @@ class Codex:
                 if branch:
                     cmd.append(branch)
                 
-                result = subprocess.run(cmd, cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                result = await _run(*cmd, cwd=cwd)
                 return {"status": "success", "message": f"Pulled changes: {result.stdout}"}
                 
             elif action == "status":
                 # Check status
-                result = subprocess.run(["git", "status"], cwd=repo_path or self.workspace_path, 
-                                      capture_output=True, text=True, check=True)
+                result = await _run("git", "status", cwd=cwd)
                 return {"status": "success", "output": result.stdout}
                 
             else:
@@ -330,15 +725,13 @@ class Codex:
         try:
             # Dynamically import huggingface_hub
             try:
-                from huggingface_hub import HfApi, hf_hub_download, snapshot_download
-                from huggingface_hub import InferenceClient
+                from huggingface_hub import snapshot_download
             except ImportError:
                 return {"status": "error", "message": "huggingface_hub not installed. Install with: pip install huggingface_hub"}
             
             if action == "search":
                 # Search for models
-                api = HfApi()
-                models = api.list_models(filter=task, search=model_id, limit=5)
+                models = _hf_api().list_models(filter=task, search=model_id, limit=5)
                 return {"status": "success", "models": [m.id for m in models]}
                 
             elif action == "download":
@@ -357,7 +750,7 @@ class Codex:
                 if not model_id or inputs is None:
                     return {"status": "error", "message": "Model ID and inputs are required for inference"}
                 
-                client = InferenceClient(model=model_id)
+                client = _inference_client(model_id)
                 result = client(inputs)
                 return {"status": "success", "result": result}
             
@@ -366,21 +759,58 @@ class Codex:
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def docker_operations(self, action, container=None, image=None, ports=None, env=None, command=None):
+    async def list_docker_containers(self, client):
+        """List all containers through the Docker SDK, or the CLI when no client is available"""
+        if client:
+            listed = await asyncio.to_thread(client.containers.list, all=True, sparse=True)
+            return [
+                {"id": c.attrs["Id"][:12], "name": c.attrs["Names"][0].lstrip("/"),
+                 "image": c.attrs["Image"], "status": c.attrs["Status"]}
+                for c in listed
+            ]
+        result = await _run("docker", "ps", "-a", "--format", "{{json .}}")
+        return [
+            {"id": c["ID"], "name": c["Names"], "image": c["Image"], "status": c["Status"]}
+            for c in map(json.loads, result.stdout.splitlines())
+        ]
+    
+    async def list_docker_images(self, client):
+        """List images through the Docker SDK, or the CLI when no client is available"""
+        if client:
+            listed = await asyncio.to_thread(client.images.list)
+            return [{"id": i.short_id.split(":", 1)[-1], "tags": i.tags} for i in listed]
+        result = await _run("docker", "images", "--format", "{{json .}}")
+        return [
+            {"id": i["ID"], "tags": [] if i["Repository"] == "<none>" else [f"{i['Repository']}:{i['Tag']}"]}
+            for i in map(json.loads, result.stdout.splitlines())
+        ]
+    
+    async def docker_operations(self, action, container=None, image=None, ports=None, env=None, command=None):
         """Interact with Docker"""
         try:
+            # Talk to the daemon socket through the SDK when available instead of forking the CLI
+            try:
+                client = await asyncio.to_thread(_docker_utils().get_docker_client)
+            except ImportError:
+                client = None
+            
             if action == "ps":
                 # List containers
-                result = subprocess.run(["docker", "ps", "-a"], capture_output=True, text=True, check=True)
-                return {"status": "success", "output": result.stdout}
+                return {"status": "success", "containers": await self.list_docker_containers(client)}
                 
             elif action == "images":
                 # List images
-                result = subprocess.run(["docker", "images"], capture_output=True, text=True, check=True)
-                return {"status": "success", "output": result.stdout}
+                return {"status": "success", "images": await self.list_docker_images(client)}
+                
+            elif action == "overview":
+                # List containers and images concurrently
+                containers, images = await asyncio.gather(
+                    self.list_docker_containers(client), self.list_docker_images(client)
+                )
+                return {"status": "success", "containers": containers, "images": images}
                 
             elif action == "run":
-                # Run a container
+                # Run a container (stays on the CLI: -p accepts ranges and bind addresses the SDK's ports dict doesn't)
                 if not image:
                     return {"status": "error", "message": "Image name is required for run action"}
                 
@@ -407,7 +837,8 @@ class Codex:
                 if command:
                     cmd.extend(command if isinstance(command, list) else [command])
                 
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                result = await _run(*cmd)
+                _invalidate_docker_caches()
                 return {"status": "success", "container_id": result.stdout.strip()}
                 
             elif action == "stop":
@@ -415,23 +846,36 @@ class Codex:
                 if not container:
                     return {"status": "error", "message": "Container name/ID is required for stop action"}
                 
-                result = subprocess.run(["docker", "stop", container], capture_output=True, text=True, check=True)
-                return {"status": "success", "output": result.stdout}
+                if client:
+                    await asyncio.to_thread(lambda: client.containers.get(container).stop())
+                    output = container
+                else:
+                    output = (await _run("docker", "stop", container)).stdout.strip()
+                _invalidate_docker_caches()
+                return {"status": "success", "output": output}
                 
             elif action == "rm":
                 # Remove a container
                 if not container:
                     return {"status": "error", "message": "Container name/ID is required for rm action"}
                 
-                result = subprocess.run(["docker", "rm", container], capture_output=True, text=True, check=True)
-                return {"status": "success", "output": result.stdout}
+                if client:
+                    await asyncio.to_thread(lambda: client.containers.get(container).remove())
+                    output = container
+                else:
+                    output = (await _run("docker", "rm", container)).stdout.strip()
+                _invalidate_docker_caches()
+                return {"status": "success", "output": output}
                 
             elif action == "logs":
                 # Get container logs
                 if not container:
                     return {"status": "error", "message": "Container name/ID is required for logs action"}
                 
-                result = subprocess.run(["docker", "logs", container], capture_output=True, text=True, check=True)
+                if client:
+                    logs = await asyncio.to_thread(lambda: client.containers.get(container).logs())
+                    return {"status": "success", "logs": logs.decode(errors="replace")}
+                result = await _run("docker", "logs", container)
                 return {"status": "success", "logs": result.stdout}
                 
             else:
@@ -444,15 +888,16 @@ class Codex:
     def open_service(self, service_name=None, path="/"):
         """Open a web service in the browser"""
         try:
+            docker_utils = _docker_utils()
             if service_name == "webui" or service_name == "open-webui":
-                return open_webui_ui()
+                return docker_utils.open_webui_ui()
             elif service_name == "flowise":
-                return open_flowise()
+                return docker_utils.open_flowise()
             elif service_name:
-                return open_web_service(service_name, path)
+                return docker_utils.open_web_service(service_name, path)
             else:
                 # List available services and let the user choose
-                services = list_all_services()
+                services = docker_utils.list_all_services()
                 return services
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -460,12 +905,12 @@ class Codex:
     def list_services(self):
         """List all available Docker services"""
         try:
-            return list_all_services()
+            return _docker_utils().list_all_services()
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    def install_package(self, package_name, manager="pip"):
-        """Install a package using the specified package manager"""
+    def install_package(self, packages=None, manager="pip", package_name=None):
+        """Install one or more packages using the specified package manager"""
         commands = {
             "pip": ["pip", "install"],
             "npm": ["npm", "install", "-g"],
@@ -477,10 +922,17 @@ class Codex:
         if manager not in commands:
             return {"status": "error", "message": f"Unknown package manager: {manager}"}
         
+        # Accept a single name or a list; a list goes to one invocation so the manager starts and resolves once
+        packages = packages or package_name
+        if not packages:
+            return {"status": "error", "message": "At least one package is required"}
+        if isinstance(packages, str):
+            packages = [packages]
+        
         try:
-            cmd = commands[manager] + [package_name]
+            cmd = commands[manager] + list(packages)
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return {"status": "success", "output": result.stdout, "message": f"Installed {package_name} using {manager}"}
+            return {"status": "success", "output": result.stdout, "message": f"Installed {', '.join(packages)} using {manager}"}
         except subprocess.CalledProcessError as e:
             return {"status": "error", "message": f"Installation error: {e.stderr}"}
         except Exception as e:
@@ -551,8 +1003,23 @@ class Codex:
         """
         print(examples)
     
-    def process_request(self, user_input):
+    async def execute_tool(self, tool_name, params):
+        """Run a single tool, awaiting async tools and moving blocking ones to a worker thread"""
+        tool_func = self.tools[tool_name]
+        if inspect.iscoroutinefunction(tool_func):
+            return await tool_func(**params)
+        return await asyncio.to_thread(tool_func, **params)
+    
+    async def execute_tool_after(self, earlier, tool_name, params):
+        """Run a tool once the given earlier tool tasks have finished, whatever their outcome"""
+        if earlier:
+            await asyncio.wait(earlier)
+        return await self.execute_tool(tool_name, params)
+    
+    async def process_request(self, user_input):
         """Process a user request using the OpenAI API with improved formatting"""
+        calls = []
+        reported = False
         try:
             if user_input.lower() == "help":
                 self.display_help()
@@ -569,106 +1036,270 @@ class Codex:
             ]
             
             # Show a spinner or message while waiting for API response
-            print("Thinking...", end="\r")
+            self.status("Thinking...")
             
-            response = openai.chat.completions.create(
-                model="gpt-4", 
-                messages=messages
-            )
+            async with self.limiter.reserve(_estimate_tokens([self.system_prompt, user_input], RESPONSE_TOKEN_ESTIMATE)):
+                stream = await self.aclient.chat.completions.create(
+                    model="gpt-4", 
+                    messages=messages,
+                    stream=True
+                )
+            
+            # Start each tool as soon as its ```json block closes instead of after the whole reply
+            content = ""
+            scanned = 0
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                content += delta
+                if "`" in delta:
+                    for match in JSON_FENCE.finditer(content, scanned):
+                        call = self.start_tool_call(match.group(1), calls)
+                        if call:
+                            calls.append(call)
+                        scanned = match.end()
             
             # Clear the thinking message
-            print(" " * 20, end="\r")
+            self.status(" " * 20)
+            
+            reported = True
+            await self.finish_tool_calls(calls)
+            self.display_response(JSON_FENCE.sub("", content).strip())
+        
+        except Exception as e:
+            self.emit(f"\n❌ Error processing request: {e}")
+            if DEBUG:
+                self.emit(f"\nStack trace: {traceback.format_exc()}")
+            # Tools started before the stream failed still run; wait for them and report what they did
+            if calls and not reported:
+                await self.finish_tool_calls(calls)
+        finally:
+            # Only reached with tasks pending if the request itself was cancelled
+            for _, task in calls:
+                if not task.done():
+                    task.cancel()
+            self.flush_output()
+    
+    async def process_batch(self, user_inputs):
+        """Process several queued user requests together through complete_batch"""
+        try:
+            pending = []
+            for user_input in user_inputs:
+                if user_input.lower() == "help":
+                    self.display_help()
+                elif user_input.lower() == "examples":
+                    self.display_examples()
+                else:
+                    pending.append(user_input)
             
-            content = response.choices[0].message.content
+            if not pending:
+                return
             
-            # Check if the response contains a tool call
-            if "```json" in content:
-                # Extract the JSON with regex to handle cases with multiple code blocks
-                json_pattern = r"```json\s*([\s\S]*?)\s*```"
-                json_matches = re.findall(json_pattern, content)
-                
-                if json_matches:
-                    for json_str in json_matches:
-                        try:
-                            tool_data = json.loads(json_str)
-                            if "tool" in tool_data and tool_data["tool"] in self.tools:
-                                print(f"\n🛠️ Executing tool: {tool_data['tool']}...")
-                                tool_func = self.tools[tool_data["tool"]]
-                                result = tool_func(**tool_data.get("params", {}))
-                                print(f"\n📊 Tool result:\n{json.dumps(result, indent=2)}")
-                            else:
-                                print(f"\n⚠️ Unknown tool or missing 'tool' key: {json_str}")
-                        except json.JSONDecodeError:
-                            print(f"\n❌ Failed to parse tool call JSON: {json_str}")
-                
-                # Display the remaining content without JSON blocks
-                clean_content = re.sub(json_pattern, "", content).strip()
-                if clean_content:
-                    print("\n" + "=" * 80)
-                    print("📝 Response:")
-                    print("=" * 80)
-                    print(clean_content)
-                    print("=" * 80)
+            self.status("Thinking...")
+            contents = await self.complete_batch(self.system_prompt, pending)
+            self.status(" " * 20)
+            
+            # Replies are handled in submission order so their output doesn't interleave
+            for user_input, content in zip(pending, contents):
+                self.emit(f"\n💬 {user_input.splitlines()[0]}")
+                if isinstance(content, Exception):
+                    self.emit(f"\n❌ Error processing request: {content}")
+                else:
+                    await self.handle_response(content)
+        
+        except Exception as e:
+            self.emit(f"\n❌ Error processing request: {e}")
+            if DEBUG:
+                self.emit(f"\nStack trace: {traceback.format_exc()}")
+        finally:
+            self.flush_output()
+    
+    def emit(self, text=""):
+        """Queue a line of request output; it is written out in one go by flush_output"""
+        self._output.append(text)
+    
+    def flush_output(self):
+        """Write all queued request output with a single write and flush"""
+        if self._output:
+            sys.stdout.write("\n".join(self._output) + "\n")
+            self._output.clear()
+        sys.stdout.flush()
+    
+    def status(self, text):
+        """Show a transient status line (overwritten by the next output) immediately"""
+        sys.stdout.write(text + "\r")
+        sys.stdout.flush()
+    
+    def start_tool_call(self, json_str, previous=()):
+        """Parse one tool-call block and start running it after the calls it depends on, returning (tool_data, task)"""
+        try:
+            tool_data = orjson.loads(json_str)
+        except json.JSONDecodeError:
+            self.emit(f"\n❌ Failed to parse tool call JSON: {json_str}")
+            return None
+        
+        if isinstance(tool_data, dict) and tool_data.get("tool") in self._TOOL_NAMES:
+            self.emit(f"\n🛠️ Executing tool: {tool_data['tool']}...")
+            # Replies chain dependent steps (write a file, then run it), so side-effecting calls
+            # wait for every earlier call; reads wait only for the last side-effecting call
+            if _is_read_only(tool_data):
+                earlier = [task for data, task in previous if not _is_read_only(data)][-1:]
             else:
-                # No tool call, just display the response
-                print("\n" + "=" * 80)
-                print("📝 Response:")
-                print("=" * 80)
-                print(content)
-                print("=" * 80)
+                earlier = [task for _, task in previous]
+            task = asyncio.ensure_future(
+                self.execute_tool_after(earlier, tool_data["tool"], tool_data.get("params", {}))
+            )
+            return tool_data, task
+        
+        self.emit(f"\n⚠️ Unknown tool or missing 'tool' key: {json_str}")
+        return None
+    
+    async def finish_tool_calls(self, calls):
+        """Wait for started tool calls and print their results in order"""
+        results = await asyncio.gather(*[task for _, task in calls], return_exceptions=True)
+        for (tool_data, _), result in zip(calls, results):
+            if isinstance(result, Exception):
+                result = {"status": "error", "message": str(result)}
+            self.emit(f"\n📊 Tool result ({tool_data['tool']}):\n{_format_result(result)}")
+    
+    def display_response(self, content):
+        """Queue the text part of a model response for output"""
+        if content:
+            self.emit("\n".join(["\n" + "=" * 80, "📝 Response:", "=" * 80, content, "=" * 80]))
+    
+    async def handle_response(self, content):
+        """Run any tool calls in a complete model response and display the remaining text"""
+        try:
+            # Start every block up front; start_tool_call orders dependent calls and lets reads overlap
+            calls = []
+            for json_str in JSON_FENCE.findall(content):
+                call = self.start_tool_call(json_str, calls)
+                if call:
+                    calls.append(call)
+            await self.finish_tool_calls(calls)
+            self.display_response(JSON_FENCE.sub("", content).strip())
         
         except Exception as e:
-            print(f"\n❌ Error processing request: {e}")
-            print(f"\nStack trace: {traceback.format_exc()}")
+            self.emit(f"\n❌ Error processing request: {e}")
+            if DEBUG:
+                self.emit(f"\nStack trace: {traceback.format_exc()}")
     
-    def run_interactive(self):
-        """Run in interactive mode with improved input handling"""
-        print("\nStarting Codex interactive session. Enter 'exit' to quit.")
-        print("For multi-line input, end your message with '##' on a new line.")
-        print("Example: Tell me about Python\n##")
+    async def read_line(self):
+        """Read a line from stdin without blocking the event loop"""
+        # A daemon thread (rather than asyncio.to_thread) so Ctrl-C never waits on a pending input()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def deliver(setter, value):
+            if not future.done():
+                setter(value)
         
+        def reader():
+            try:
+                line = input()
+            except BaseException as e:
+                loop.call_soon_threadsafe(deliver, future.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(deliver, future.set_result, line)
+        
+        threading.Thread(target=reader, daemon=True).start()
+        return await future
+    
+    async def consume_requests(self, queue):
+        """Drain the request queue, coalescing turns that arrive within the batching window"""
         while True:
+            batch = [await queue.get()]
+            try:
+                while len(batch) < MAX_BATCH:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=BATCH_WAIT_MS / 1000))
+            except asyncio.TimeoutError:
+                pass
+            
             try:
-                # Collect multi-line input
-                lines = []
-                print("\nCodex> ", end="")
-                
-                while True:
-                    line = input()
-                    if line.strip() == "##":
-                        break
-                    if line.lower() in ["exit", "quit"]:
-                        print("Goodbye! 👋")
-                        return
-                    lines.append(line)
-                
-                user_input = "\n".join(lines).strip()
-                if not user_input:
-                    continue
-                
-                # Process the complete input
                 print("\n🔄 Processing your request...\n")
-                self.process_request(user_input)
+                if len(batch) == 1:
+                    await self.process_request(batch[0])
+                else:
+                    await self.process_batch(batch)
                 print("\n✅ Response complete.")
-            
-            except KeyboardInterrupt:
-                print("\nExiting...")
-                break
             except Exception as e:
                 print(f"Error: {e}")
-                print("Try again or type 'exit' to quit.")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def run_interactive(self):
+        """Run in interactive mode with improved input handling"""
+        print("\nStarting Codex interactive session. Enter 'exit' to quit.")
+        print("For multi-line input, end your message with '##' on a new line.")
+        print("Example: Tell me about Python\n##")
+        
+        queue = asyncio.Queue()
+        consumer = asyncio.create_task(self.consume_requests(queue))
+        
+        try:
+            while True:
+                try:
+                    # Collect multi-line input
+                    lines = []
+                    print("\nCodex> ", end="", flush=True)
+                    
+                    while True:
+                        line = await self.read_line()
+                        if line.strip() == "##":
+                            break
+                        if line.lower() in ["exit", "quit"]:
+                            # Let requests that are already queued finish first
+                            await queue.join()
+                            print("Goodbye! 👋")
+                            return
+                        lines.append(line)
+                    
+                    user_input = "\n".join(lines).strip()
+                    if not user_input:
+                        continue
+                    
+                    # Hand off to the consumer and go straight back to reading input
+                    queue.put_nowait(user_input)
+                
+                except EOFError:
+                    await queue.join()
+                    print("\nExiting...")
+                    break
+                except KeyboardInterrupt:
+                    print("\nExiting...")
+                    break
+                except Exception as e:
+                    print(f"Error: {e}")
+                    print("Try again or type 'exit' to quit.")
+        finally:
+            consumer.cancel()
 
 def main():
     parser = argparse.ArgumentParser(description="Codex - AI Assistant with extended capabilities")
     parser.add_argument("--interactive", "-i", action="store_true", help="Run in interactive mode")
+    parser.add_argument("--batch", metavar="INFILE",
+                        help="Submit code generation tasks from a JSONL file to the OpenAI Batch API")
+    parser.add_argument("--language", default="python", help="Language for --batch code generation")
     args = parser.parse_args()
     
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not found in environment variables.")
+        sys.exit(1)
+    
     codex = Codex()
     
-    if args.interactive:
-        codex.run_interactive()
-    else:
-        codex.run_interactive()  # Default to interactive mode for now
+    try:
+        if args.batch:
+            if not asyncio.run(codex.run_batch_file(args.batch, args.language)):
+                sys.exit(1)
+        elif args.interactive:
+            asyncio.run(codex.run_interactive())
+        else:
+            asyncio.run(codex.run_interactive())  # Default to interactive mode for now
+    except KeyboardInterrupt:
+        print("\nExiting...")
 
 if __name__ == "__main__":
     main()
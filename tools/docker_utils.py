@@ -4,98 +4,225 @@ Docker utilities for Codex to interact with running services
 """
 import subprocess
 import json
+import threading
 import time
 import webbrowser
 import requests
-from typing import Dict, List, Optional, Union, Any
+from requests.adapters import HTTPAdapter
+from cachetools.func import ttl_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from types import MappingProxyType
+from urllib.parse import urlunsplit
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union, Any
 
-def get_all_containers(running_only: bool = True) -> List[Dict[str, Any]]:
-    """Get information about all Docker containers"""
+_docker_client = None
+
+# Shared HTTP session so repeated health probes reuse connections; the pool is
+# sized for check_services_health's fan-out and failed probes are not retried
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=0))
+
+# Upper bound on concurrent health probes
+MAX_HEALTH_WORKERS = 32
+
+# Port mappings are remembered per container ID for PORT_CACHE_TTL seconds; the expiry
+# catches containers restarted outside Codex, which get new host ports under -P
+PORT_CACHE_SIZE = 256
+PORT_CACHE_TTL = 30.0
+
+# How long a name -> container snapshot is reused by get_container_by_name (seconds)
+CONTAINER_CACHE_TTL = 2.0
+_containers_cache: Optional[Tuple[float, Dict[str, Dict[str, Any]]]] = None
+_containers_cache_lock = threading.Lock()
+
+def get_docker_client():
+    """Return a shared Docker SDK client, or None if the SDK or daemon is unavailable"""
+    global _docker_client
+    if _docker_client is None:
+        try:
+            import docker
+            _docker_client = docker.from_env(timeout=5)
+        except Exception:
+            return None
+    return _docker_client
+
+def _summarize_container(attrs: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape a Docker API container summary into the docker ps --format json fields used here"""
+    return {
+        "ID": attrs.get('Id', '')[:12],
+        "Names": ",".join(name.lstrip('/') for name in attrs.get('Names') or []),
+        "Image": attrs.get('Image', ''),
+        "State": attrs.get('State', ''),
+        "Status": attrs.get('Status', '')
+    }
+
+def iter_all_containers(running_only: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield information about Docker containers as it is read"""
+    client = get_docker_client()
+    if client is not None:
+        try:
+            # sparse=True keeps this to one list call instead of an inspect per container
+            containers = client.containers.list(all=not running_only, sparse=True)
+        except Exception as e:
+            print(f"Error getting container info: {e}")
+            return
+        for container in containers:
+            yield _summarize_container(container.attrs)
+        return
+    
     cmd = ["docker", "ps", "-a", "--format", "{{json .}}"]
     if running_only:
         cmd = ["docker", "ps", "--format", "{{json .}}"]
     
-    try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        containers = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                containers.append(json.loads(line))
-        return containers
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting container info: {e}")
-        return []
+    # docker ps prints one JSON object per line, so records can be decoded as they arrive
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        for line in process.stdout:
+            if line.strip():
+                yield json.loads(line)
+        stderr = process.stderr.read()
+    if process.returncode != 0:
+        print(f"Error getting container info: {stderr.strip()}")
+
+def get_all_containers(running_only: bool = True) -> List[Dict[str, Any]]:
+    """Get information about all Docker containers"""
+    return list(iter_all_containers(running_only))
 
 def get_container_by_name(name: str) -> Optional[Dict[str, Any]]:
     """Get container details by name"""
-    containers = get_all_containers(running_only=False)
-    for container in containers:
-        if container.get('Names') == name:
-            return container
-    return None
-
-def get_port_mappings(container_id: str) -> Dict[str, str]:
-    """Get port mappings for a container"""
-    try:
+    global _containers_cache
+    # The lock makes concurrent lookups in a burst share a single listing
+    with _containers_cache_lock:
+        if _containers_cache is None or time.monotonic() - _containers_cache[0] >= CONTAINER_CACHE_TTL:
+            by_name = {}
+            for container in iter_all_containers(running_only=False):
+                for container_name in container.get('Names', '').split(','):
+                    by_name[container_name] = container
+            _containers_cache = (time.monotonic(), by_name)
+        return _containers_cache[1].get(name)
+
+def invalidate_container_cache():
+    """Drop the cached container listing and port mappings, e.g. after starting or removing a container"""
+    global _containers_cache
+    with _containers_cache_lock:
+        _containers_cache = None
+    _lookup_port_mappings.cache_clear()
+
+def _format_binding(binding: Dict[str, str]) -> str:
+    """Render a Docker port binding as host:port, bracketing IPv6 hosts"""
+    host = binding.get('HostIp') or '0.0.0.0'
+    if ':' in host:
+        host = f"[{host}]"
+    return f"{host}:{binding.get('HostPort', '')}"
+
+def _service_url(host_mapping: str, path: str = "") -> str:
+    """Build an http URL from a host:port mapping, which already brackets IPv6 hosts"""
+    return urlunsplit(("http", host_mapping, path, "", ""))
+
+def _port_map(ports: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Convert NetworkSettings.Ports into {container_port: host:port}, keeping the first binding"""
+    return {
+        container_port: _format_binding(bindings[0])
+        for container_port, bindings in (ports or {}).items()
+        if bindings
+    }
+
+@ttl_cache(maxsize=PORT_CACHE_SIZE, ttl=PORT_CACHE_TTL)
+def _lookup_port_mappings(container_id: str) -> Mapping[str, str]:
+    """Fetch a container's port mappings, raising on failure so that errors are not cached"""
+    client = get_docker_client()
+    if client is not None:
+        ports = client.containers.get(container_id).attrs['NetworkSettings']['Ports']
+    else:
         result = subprocess.run(
-            ["docker", "container", "port", container_id], 
+            ["docker", "inspect", "--format", "{{json .NetworkSettings.Ports}}", container_id],
             check=True, capture_output=True, text=True
         )
-        
-        port_map = {}
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                parts = line.split(' -> ')
-                if len(parts) == 2:
-                    container_port = parts[0]
-                    host_mapping = parts[1]
-                    port_map[container_port] = host_mapping
-        
-        return port_map
-    except subprocess.CalledProcessError as e:
+        ports = json.loads(result.stdout)
+    # Read-only view, since every caller shares the cached value
+    return MappingProxyType(_port_map(ports))
+
+def get_port_mappings(container_id: str) -> Mapping[str, str]:
+    """Get port mappings for a container, cached by ID for PORT_CACHE_TTL seconds or until invalidate_container_cache"""
+    try:
+        return _lookup_port_mappings(container_id)
+    except Exception as e:
         print(f"Error getting port info: {e}")
-        return {}
+        return MappingProxyType({})
+
+def _inspect_containers(container_ids: List[str]) -> List[Dict[str, Any]]:
+    """Get the full inspect payload for many containers (a single docker inspect call on the CLI path)"""
+    if not container_ids:
+        return []
+    
+    client = get_docker_client()
+    if client is not None:
+        payloads = []
+        for container_id in container_ids:
+            try:
+                payloads.append(client.api.inspect_container(container_id))
+            except Exception as e:
+                print(f"Error inspecting container {container_id}: {e}")
+        return payloads
+    
+    # No check=True: a container removed since it was listed fails the call but the rest still print
+    result = subprocess.run(
+        ["docker", "inspect", "--format", "{{json .}}"] + list(container_ids),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(f"Error inspecting containers: {result.stderr.strip()}")
+    return [json.loads(line) for line in result.stdout.splitlines() if line]
+
+def _is_running(container: Dict[str, Any]) -> bool:
+    """Check a container record's state without another Docker call"""
+    return container.get('State') == 'running' or str(container.get('Status', '')).startswith('Up')
 
 def open_web_service(service_name: str, path: str = "/") -> Dict[str, Any]:
     """Open a web service in the browser"""
     container = get_container_by_name(service_name)
     if not container:
         return {"status": "error", "message": f"Service {service_name} not found"}
+    if not _is_running(container):
+        return {"status": "error", "message": f"Service {service_name} is not running"}
     
     port_mappings = get_port_mappings(container.get('ID', ''))
     if not port_mappings:
         return {"status": "error", "message": f"No port mappings for {service_name}"}
     
-    # Find the first port mapping
-    for container_port, host_mapping in port_mappings.items():
-        host, port = host_mapping.split(':')
-        url = f"http://{host}:{port}{path}"
-        webbrowser.open(url)
-        return {"status": "success", "message": f"Opened {url}", "url": url}
-    
-    return {"status": "error", "message": "Failed to find a valid port mapping"}
+    # Use the first port mapping
+    container_port, host_mapping = next(iter(port_mappings.items()))
+    url = _service_url(host_mapping, path)
+    webbrowser.open(url)
+    return {"status": "success", "message": f"Opened {url}", "url": url}
 
 def check_service_health(service_name: str, port: str = None, path: str = "/") -> Dict[str, Any]:
     """Check if a web service is healthy"""
     container = get_container_by_name(service_name)
     if not container:
         return {"status": "error", "message": f"Service {service_name} not found"}
+    if not _is_running(container):
+        return {"status": "error", "message": f"Service {service_name} is not running"}
     
     if port:
-        url = f"http://localhost:{port}{path}"
+        url = _service_url(f"localhost:{port}", path)
     else:
         port_mappings = get_port_mappings(container.get('ID', ''))
         if not port_mappings:
             return {"status": "error", "message": f"No port mappings for {service_name}"}
         
-        # Find the first port mapping
-        for container_port, host_mapping in port_mappings.items():
-            host, port = host_mapping.split(':')
-            url = f"http://{host}:{port}{path}"
-            break
+        # Use the first port mapping
+        container_port, host_mapping = next(iter(port_mappings.items()))
+        url = _service_url(host_mapping, path)
     
     try:
-        response = requests.get(url, timeout=5)
+        # HEAD skips the response body; fall back to GET for servers that don't
+        # support it or are too slow to answer within the short HEAD timeout
+        try:
+            response = _SESSION.head(url, timeout=1, allow_redirects=True)
+            if response.status_code in (405, 501):
+                response = _SESSION.get(url, timeout=5)
+        except requests.Timeout:
+            response = _SESSION.get(url, timeout=5)
         if response.status_code < 400:
             return {
                 "status": "success", 
@@ -113,6 +240,40 @@ def check_service_health(service_name: str, port: str = None, path: str = "/") -
     except requests.RequestException as e:
         return {"status": "error", "message": f"Failed to connect: {str(e)}", "url": url}
 
+def _health_result(future) -> Dict[str, Any]:
+    """Get a finished health-check future's result, turning an exception into an error record"""
+    try:
+        return future.result()
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def check_services_health(service_names: List[str], deadline_s: float = 2.0) -> Dict[str, Any]:
+    """Check several services concurrently, marking any still pending after deadline_s as timed out"""
+    if not service_names:
+        return {"status": "success", "services": {}}
+    
+    executor = ThreadPoolExecutor(max_workers=min(MAX_HEALTH_WORKERS, len(service_names)))
+    futures = {executor.submit(check_service_health, name): name for name in service_names}
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=deadline_s):
+            results[futures[future]] = _health_result(future)
+    except FuturesTimeoutError:
+        # Futures that finished just before the deadline may not have been yielded yet
+        for future, name in futures.items():
+            if name in results:
+                continue
+            if future.done():
+                results[name] = _health_result(future)
+            else:
+                future.cancel()
+                results[name] = {"status": "timeout", "message": f"No result for {name} within {deadline_s}s"}
+    finally:
+        # Don't block on stragglers; their own 5s request timeout bounds them
+        executor.shutdown(wait=False)
+    
+    return {"status": "success", "services": {name: results[name] for name in futures.values()}}
+
 def open_webui_ui() -> Dict[str, Any]:
     """Open the Open WebUI interface"""
     return open_web_service("open-webui")
@@ -123,25 +284,19 @@ def open_flowise() -> Dict[str, Any]:
 
 def list_all_services() -> Dict[str, Any]:
     """List all running services with their URLs"""
-    containers = get_all_containers()
+    container_ids = [container['ID'] for container in iter_all_containers()]
     services = []
     
-    for container in containers:
-        container_id = container.get('ID', '')
-        name = container.get('Names', '')
-        port_mappings = get_port_mappings(container_id)
-        
-        urls = []
-        for container_port, host_mapping in port_mappings.items():
-            host, port = host_mapping.split(':')
-            urls.append(f"http://{host}:{port}")
+    # Name, state and ports all come from the one inspect payload per container
+    for info in _inspect_containers(container_ids):
+        port_mappings = _port_map((info.get('NetworkSettings') or {}).get('Ports'))
         
         services.append({
-            "name": name,
-            "id": container_id,
-            "status": container.get('Status', ''),
+            "name": info.get('Name', '').lstrip('/'),
+            "id": info['Id'][:12],
+            "status": (info.get('State') or {}).get('Status', ''),
             "ports": port_mappings,
-            "urls": urls
+            "urls": [_service_url(host_mapping) for host_mapping in port_mappings.values()]
         })
     
     return {"status": "success", "services": services}
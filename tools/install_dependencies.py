@@ -6,43 +6,87 @@ This script installs all required dependencies for the Codex assistant
 import subprocess
 import sys
 import os
+import json
 import platform
+import re
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from importlib.metadata import distributions
 from pathlib import Path
 
+# Operating system name ("Darwin", "Linux", ...), read once
+_SYSTEM = platform.system()
+
+# Homebrew commands contend for the same locks, so phases running in parallel take turns
+_BREW_LOCK = threading.Lock()
+
 def print_status(message):
     """Print a formatted status message"""
     print(f"\n{'='*60}\n{message}\n{'='*60}")
 
 def run_command(command, check=True):
-    """Run a shell command and return the result"""
+    """Run a command (argv list or string), printing its output as it arrives, and return whether it succeeded"""
+    argv = shlex.split(command) if isinstance(command, str) else list(command)
     try:
-        result = subprocess.run(command, shell=True, check=check, text=True, capture_output=True)
-        if result.stdout:
-            print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
+        with _BREW_LOCK if argv[0] == "brew" else nullcontext():
+            with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  text=True, bufsize=1) as process:
+                for line in process.stdout:
+                    print(line, end="")
+                returncode = process.wait()
+    except OSError as e:
         print(f"Error: {e}")
-        if e.stderr:
-            print(e.stderr)
         return False
+    
+    if check and returncode != 0:
+        print(f"Error: {subprocess.CalledProcessError(returncode, argv)}")
+        return False
+    return True
+
+def _run_shell_pipeline(command, check=True):
+    """Run a command that needs the shell for pipes, && chains or $(...) substitution"""
+    return run_command(["sh", "-c", command], check)
 
 def install_package(package_manager, package):
     """Install a package using the specified package manager"""
+    return install_packages(package_manager, [package])
+
+def install_packages(package_manager, packages):
+    """Install several packages with a single package manager invocation"""
     managers = {
-        'pip': 'pip install',
-        'npm': 'npm install -g',
-        'brew': 'brew install',
-        'gem': 'gem install',
+        'pip': ['pip', 'install'],
+        'npm': ['npm', 'install', '-g'],
+        'brew': ['brew', 'install'],
+        'gem': ['gem', 'install'],
     }
     
     if package_manager not in managers:
         print(f"Unknown package manager: {package_manager}")
         return False
     
-    cmd = f"{managers[package_manager]} {package}"
-    print(f"Running: {cmd}")
+    cmd = managers[package_manager] + list(packages)
+    print(f"Running: {shlex.join(cmd)}")
     return run_command(cmd)
 
+def _normalize_name(name):
+    """Normalize a Python package name (PEP 503) so requested and installed names compare equal"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _installed_pip_pkgs():
+    """Get the normalized names of the Python packages already installed"""
+    return {_normalize_name(dist.metadata["Name"]) for dist in distributions() if dist.metadata["Name"]}
+
+def _installed_npm_pkgs():
+    """Get the names of the globally installed npm packages"""
+    try:
+        # npm ls exits non-zero for problems like extraneous packages but still prints the tree
+        result = subprocess.run(["npm", "ls", "-g", "--depth=0", "--json"], capture_output=True, text=True)
+        return set(json.loads(result.stdout or "{}").get("dependencies", {}))
+    except (OSError, ValueError):
+        return set()
+
 def ensure_python_packages():
     """Install required Python packages"""
     print_status("Installing Python packages")
@@ -53,26 +97,26 @@ def ensure_python_packages():
     
     if requirements_file.exists():
         print(f"Installing packages from {requirements_file}")
-        return run_command(f"pip install -r {requirements_file}")
+        return run_command(["pip", "install", "-r", str(requirements_file)])
     else:
         print("requirements.txt not found, installing essential packages")
         packages = [
             "openai",
             "python-dotenv",
             "requests",
-            "beautifulsoup4",
+            "selectolax",
             "huggingface_hub",
             "playwright",
             "selenium",
             "rich"
         ]
         
-        success = True
-        for package in packages:
-            if not install_package('pip', package):
-                success = False
-        
-        return success
+        installed = _installed_pip_pkgs()
+        missing = [package for package in packages if _normalize_name(package) not in installed]
+        if not missing:
+            print("All essential packages are already installed")
+            return True
+        return install_packages('pip', missing)
 
 def setup_browser_automation():
     """Set up browser automation tools"""
@@ -84,14 +128,14 @@ def setup_browser_automation():
     
     # Install WebDriver for Selenium
     print("Setting up WebDriver for Selenium")
-    if platform.system() == "Darwin":  # macOS
+    if _SYSTEM == "Darwin":  # macOS
         run_command("brew install --cask chromedriver", check=False)
-    elif platform.system() == "Linux":
-        run_command("CHROMEDRIVER_VERSION=$(curl -s https://chromedriver.storage.googleapis.com/LATEST_RELEASE) && " +
-                   "wget -q -O /tmp/chromedriver.zip https://chromedriver.storage.googleapis.com/${CHROMEDRIVER_VERSION}/chromedriver_linux64.zip && " +
-                   "unzip /tmp/chromedriver.zip -d /tmp && " +
-                   "sudo mv /tmp/chromedriver /usr/local/bin/chromedriver && " +
-                   "sudo chmod +x /usr/local/bin/chromedriver", check=False)
+    elif _SYSTEM == "Linux":
+        _run_shell_pipeline("CHROMEDRIVER_VERSION=$(curl -s https://chromedriver.storage.googleapis.com/LATEST_RELEASE) && " +
+                            "wget -q -O /tmp/chromedriver.zip https://chromedriver.storage.googleapis.com/${CHROMEDRIVER_VERSION}/chromedriver_linux64.zip && " +
+                            "unzip /tmp/chromedriver.zip -d /tmp && " +
+                            "sudo mv /tmp/chromedriver /usr/local/bin/chromedriver && " +
+                            "sudo chmod +x /usr/local/bin/chromedriver", check=False)
     
     return True
 
@@ -103,7 +147,7 @@ def setup_node_environment():
     node_installed = run_command("node --version", check=False)
     
     if not node_installed:
-        if platform.system() == "Darwin":  # macOS
+        if _SYSTEM == "Darwin":  # macOS
             print("Installing Node.js using Homebrew")
             run_command("brew install node")
         else:
@@ -118,12 +162,12 @@ def setup_node_environment():
         "prettier"
     ]
     
-    success = True
-    for package in node_packages:
-        if not install_package('npm', package):
-            success = False
-    
-    return success
+    installed = _installed_npm_pkgs()
+    missing = [package for package in node_packages if package not in installed]
+    if not missing:
+        print("All Node.js packages are already installed")
+        return True
+    return install_packages('npm', missing)
 
 def setup_git_environment():
     """Set up Git environment and configuration"""
@@ -133,7 +177,7 @@ def setup_git_environment():
     git_installed = run_command("git --version", check=False)
     
     if not git_installed:
-        if platform.system() == "Darwin":  # macOS
+        if _SYSTEM == "Darwin":  # macOS
             print("Installing Git using Homebrew")
             run_command("brew install git")
         else:
@@ -155,7 +199,7 @@ def install_extra_cli_tools():
     """Install extra CLI tools that might be useful"""
     print_status("Installing extra CLI tools")
     
-    if platform.system() == "Darwin":  # macOS
+    if _SYSTEM == "Darwin":  # macOS
         brew_packages = [
             "jq",        # JSON processor
             "fzf",       # Fuzzy finder
@@ -164,36 +208,37 @@ def install_extra_cli_tools():
             "ripgrep"    # Fast grep
         ]
         
-        for package in brew_packages:
-            install_package('brew', package)
+        install_packages('brew', brew_packages)
     else:
         print("Please install extra tools manually as needed.")
     
     return True
 
+def run_phases(phases):
+    """Run setup phases in order and return the descriptions of those that failed"""
+    return [description for phase, description in phases if not phase()]
+
 def main():
     """Main function to install all dependencies"""
     print_status("Starting Codex dependency installation")
     
-    # Ensure Python packages
-    if not ensure_python_packages():
-        print("Failed to install Python packages")
-    
-    # Set up browser automation
-    if not setup_browser_automation():
-        print("Failed to set up browser automation")
-    
-    # Set up Node.js environment
-    if not setup_node_environment():
-        print("Failed to set up Node.js environment")
-    
-    # Set up Git environment
+    # Set up Git environment first, on its own, since it may ask the user to configure Git
     if not setup_git_environment():
         print("Failed to set up Git environment")
     
-    # Install extra CLI tools
-    if not install_extra_cli_tools():
-        print("Failed to install extra CLI tools")
+    # The remaining phases are independent network-bound installs and run in parallel,
+    # except browser setup, which needs the playwright package from the Python phase
+    chains = [
+        [(ensure_python_packages, "install Python packages"),
+         (setup_browser_automation, "set up browser automation")],
+        [(setup_node_environment, "set up Node.js environment")],
+        [(install_extra_cli_tools, "install extra CLI tools")],
+    ]
+    with ThreadPoolExecutor(max_workers=len(chains)) as executor:
+        futures = [executor.submit(run_phases, chain) for chain in chains]
+        for future in as_completed(futures):
+            for description in future.result():
+                print(f"Failed to {description}")
     
     print_status("Dependency installation complete!")
     print("You can now run Codex with: python codex.py")
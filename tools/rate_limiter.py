@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiting for Codex's OpenAI calls
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+class RateLimiter:
+    """Paces requests against both a requests-per-minute and a tokens-per-minute budget"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_requests = requests_per_minute
+        self.available_tokens = tokens_per_minute
+        self.last_update = time.monotonic()
+
+    def _replenish(self):
+        """Refill both buckets for the time elapsed since the last update"""
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        self.available_requests = min(
+            self.requests_per_minute, self.available_requests + elapsed * self.requests_per_minute / 60
+        )
+        self.available_tokens = min(
+            self.tokens_per_minute, self.available_tokens + elapsed * self.tokens_per_minute / 60
+        )
+
+    async def acquire(self, estimated_tokens: int = 0):
+        """Wait until there is capacity for one request of the given size, then claim it"""
+        # A single call larger than the whole bucket would otherwise wait forever
+        estimated_tokens = min(estimated_tokens, self.tokens_per_minute)
+        while True:
+            # Check-and-claim has no await in between, so it is atomic on the event loop
+            self._replenish()
+            if self.available_requests >= 1 and self.available_tokens >= estimated_tokens:
+                self.available_requests -= 1
+                self.available_tokens -= estimated_tokens
+                return
+
+            wait = max(
+                (1 - self.available_requests) * 60 / self.requests_per_minute,
+                (estimated_tokens - self.available_tokens) * 60 / self.tokens_per_minute
+            )
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def reserve(self, estimated_tokens: int = 0):
+        """Async context manager form of acquire, for wrapping an API call"""
+        await self.acquire(estimated_tokens)
+        yield
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Persistent shell processes for Codex to run commands without starting a new shell per call
+"""
+import os
+import selectors
+import shlex
+import subprocess
+import threading
+import uuid
+from typing import List, Optional, Tuple
+
+class PersistentShell:
+    """A long-lived bash process that commands are written to over stdin"""
+
+    def __init__(self, cwd: Optional[str] = None):
+        self.process = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"], cwd=cwd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+    def alive(self) -> bool:
+        """Check whether the shell process is still running"""
+        return self.process.poll() is None
+
+    def run(self, command: str) -> Tuple[int, str, str]:
+        """Run a command and return (returncode, stdout, stderr)"""
+        # Each command runs in a subshell so cd/export/exit don't leak into later calls,
+        # then a unique marker carrying the exit status is written to both streams
+        marker = f"__CODEX_END_{uuid.uuid4().hex}__"
+        script = (
+            f"( eval {shlex.quote(command)} ) < /dev/null\n"
+            f"printf '\\n{marker} %d\\n' $?\n"
+            f"printf '\\n{marker}\\n' >&2\n"
+        )
+        self.process.stdin.write(script.encode())
+        self.process.stdin.flush()
+
+        stdout_end = f"\n{marker} ".encode()
+        stderr_end = f"\n{marker}\n".encode()
+        buffers = {self.process.stdout: bytearray(), self.process.stderr: bytearray()}
+        returncode = None
+        stdout_done = stderr_done = False
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            selector.register(self.process.stderr, selectors.EVENT_READ)
+
+            while not (stdout_done and stderr_done):
+                for key, _ in selector.select():
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        # The shell itself went away; report whatever it produced
+                        selector.unregister(key.fileobj)
+                        stdout_done = stdout_done or key.fileobj is self.process.stdout
+                        stderr_done = stderr_done or key.fileobj is self.process.stderr
+                        continue
+                    buffers[key.fileobj] += chunk
+
+                out = buffers[self.process.stdout]
+                if not stdout_done:
+                    index = out.find(stdout_end)
+                    if index != -1 and out.endswith(b"\n"):
+                        returncode = int(out[index + len(stdout_end):].strip())
+                        del out[index:]
+                        stdout_done = True
+
+                err = buffers[self.process.stderr]
+                if not stderr_done and err.endswith(stderr_end):
+                    del err[-len(stderr_end):]
+                    stderr_done = True
+
+        if returncode is None:
+            returncode = self.process.wait()
+
+        return (
+            returncode,
+            buffers[self.process.stdout].decode(errors="replace"),
+            buffers[self.process.stderr].decode(errors="replace")
+        )
+
+    def close(self):
+        """Terminate the shell process"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+class ShellPool:
+    """Hands out idle persistent shells so concurrent commands don't queue behind each other"""
+
+    def __init__(self, cwd: Optional[str] = None, max_idle: int = 4):
+        self.cwd = cwd
+        self.max_idle = max_idle
+        self._idle: List[PersistentShell] = []
+        self._lock = threading.Lock()
+
+    def run(self, command: str) -> Tuple[int, str, str]:
+        """Run a command on an idle shell, starting a new one if none is free"""
+        with self._lock:
+            shell = self._idle.pop() if self._idle else None
+
+        if shell is None or not shell.alive():
+            if shell is not None:
+                shell.close()
+            shell = PersistentShell(self.cwd)
+
+        try:
+            result = shell.run(command)
+        except BaseException:
+            shell.close()
+            raise
+
+        with self._lock:
+            if shell.alive() and len(self._idle) < self.max_idle:
+                self._idle.append(shell)
+                shell = None
+        if shell is not None:
+            shell.close()
+
+        return result
+
+    def close(self):
+        """Terminate all idle shells"""
+        with self._lock:
+            shells, self._idle = self._idle, []
+        for shell in shells:
+            shell.close()
@@ -5,9 +5,13 @@ Test the capabilities of Codex by executing a series of commands
 import os
 import sys
 import json
+import re
+import shlex
 import subprocess
 import importlib.util
+from importlib.metadata import distributions
 from pathlib import Path
+from dotenv import dotenv_values
 
 # Add parent directory to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -19,6 +23,10 @@ except ImportError:
     print("Warning: Docker utilities not found.")
     list_all_services = None
 
+# Installed packages whose names contain any of these are reported by check_python
+PYTHON_PACKAGE_KEYWORDS = ("openai", "requests", "selectolax", "playwright", "huggingface", "langchain")
+PYTHON_PACKAGE_PATTERN = re.compile("|".join(map(re.escape, PYTHON_PACKAGE_KEYWORDS)))
+
 def print_header(message):
     """Print a formatted header"""
     print("\n" + "="*70)
@@ -26,24 +34,37 @@ def print_header(message):
     print("="*70)
 
 def run_command(command):
-    """Run a shell command and return result"""
-    print(f"\n> {command}")
+    """Run a command (argv list or string), printing its output as it arrives, and return whether it succeeded"""
+    argv = shlex.split(command) if isinstance(command, str) else list(command)
+    print(f"\n> {shlex.join(argv)}")
     try:
-        result = subprocess.run(command, shell=True, check=True, text=True, capture_output=True)
-        if result.stdout:
-            print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
+        with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, bufsize=1) as process:
+            for line in process.stdout:
+                print(line, end="")
+            returncode = process.wait()
+    except OSError as e:
         print(f"Error: {e}")
-        if e.stderr:
-            print(e.stderr)
         return False
+    
+    if returncode != 0:
+        print(f"Error: {subprocess.CalledProcessError(returncode, argv)}")
+        return False
+    return True
 
 def check_python():
     """Check Python environment"""
     print_header("CHECKING PYTHON ENVIRONMENT")
     run_command("python --version")
-    run_command("pip list | grep -E 'openai|requests|beautifulsoup4|playwright|huggingface|langchain'")
+    
+    # Read installed package metadata in-process rather than running pip list | grep
+    installed = {}
+    for dist in distributions():
+        name = dist.metadata["Name"]
+        if name and PYTHON_PACKAGE_PATTERN.search(name.lower()):
+            installed.setdefault(name, dist.version)
+    for name in sorted(installed, key=str.lower):
+        print(f"{name}=={installed[name]}")
 
 def check_node():
     """Check Node.js environment"""
@@ -55,27 +76,16 @@ def check_browser_tools():
     """Check browser automation tools"""
     print_header("CHECKING BROWSER AUTOMATION TOOLS")
     
-    # Check for Playwright
-    try:
-        spec = importlib.util.find_spec("playwright")
-        if spec is not None:
-            print("✓ Playwright is installed")
+    # find_spec returns None for a missing top-level module rather than raising
+    for module, label in (("playwright", "Playwright"), ("selenium", "Selenium")):
+        if importlib.util.find_spec(module) is None:
+            print(f"✗ {label} is not installed")
+            continue
+        
+        print(f"✓ {label} is installed")
+        if module == "playwright":
             # Try to get browser info
             run_command("python -m playwright --version")
-        else:
-            print("✗ Playwright is not installed")
-    except ImportError:
-        print("✗ Playwright is not installed")
-    
-    # Check for Selenium
-    try:
-        spec = importlib.util.find_spec("selenium")
-        if spec is not None:
-            print("✓ Selenium is installed")
-        else:
-            print("✗ Selenium is not installed")
-    except ImportError:
-        print("✗ Selenium is not installed")
 
 def check_docker():
     """Check Docker environment"""
@@ -118,10 +128,18 @@ def check_file_structure():
         "tools/install_dependencies.py"
     ]
     
+    # List each directory once instead of stat-ing every required file
+    found = set()
+    for directory in {os.path.dirname(file_path) for file_path in required_files}:
+        try:
+            with os.scandir(os.path.join(ratlab_dir, directory)) as entries:
+                found.update(f"{directory}/{entry.name}" if directory else entry.name for entry in entries)
+        except OSError:
+            pass
+    
     print("Checking for required files:")
     for file_path in required_files:
-        full_path = os.path.join(ratlab_dir, file_path)
-        if os.path.exists(full_path):
+        if file_path in found:
             print(f"  ✓ {file_path}")
         else:
             print(f"  ✗ {file_path} (missing)")
@@ -132,15 +150,20 @@ def check_openai_api():
     
     env_path = os.path.join(parent_dir, ".env")
     if os.path.exists(env_path):
-        with open(env_path, "r") as f:
-            content = f.read()
-        
-        if "OPENAI_API_KEY" in content:
+        key = dotenv_values(env_path).get("OPENAI_API_KEY")
+        if key:
             print("✓ OPENAI_API_KEY found in .env file")
             
-            # Test API key validity
+            # Test API key validity in-process; the key never passes through a shell
             print("\nTesting API connection...")
-            run_command("python -c \"import openai; openai.api_key = '$(grep OPENAI_API_KEY .env | cut -d= -f2)'; print(openai.models.list())\"")
+            try:
+                from openai import OpenAI
+                models = OpenAI(api_key=key).models.list()
+                print(f"✓ API connection works ({len(models.data)} models available)")
+            except ImportError:
+                print("✗ openai package is not installed")
+            except Exception as e:
+                print(f"Error: {e}")
         else:
             print("✗ OPENAI_API_KEY not found in .env file")
     else: